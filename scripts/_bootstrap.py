@@ -0,0 +1,23 @@
+"""Shared startup for the scripts in this directory: .env + sys.path, once."""
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """Load .env into os.environ and put ./src on sys.path.
+
+    Cached so repeated imports within one process never re-read or re-parse
+    the dotenv file.
+    """
+    try:
+        from dotenv import dotenv_values
+
+        os.environ.update({k: v for k, v in dotenv_values(".env").items() if v})
+    except Exception:
+        pass
+    src = str(Path.cwd() / "src")
+    if src not in sys.path:
+        sys.path.insert(0, src)
@@ -2,24 +2,50 @@
 import os
 import re
 import sys
-import json
 from pathlib import Path
 
+# orjson is ~3-10x faster on float-heavy payloads like invoice line items
+try:
+    import orjson
+    _dumps = lambda o: orjson.dumps(o).decode()
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _dumps = json.dumps
+    _loads = json.loads
+
+
+# Preference order in filename: commercial invoice > invoice > proforma > pi.
+# One alternation with named groups lets us rank each filename in a single scan
+# instead of re-running four patterns over the whole attachment list.
+_INVOICE_RE = re.compile(
+    r"(?P<p0>commercial\s*invoice)"
+    r"|(?P<p1>\binvoice\b)"
+    r"|(?P<p2>proforma\s*invoice|\bproforma\b)"
+    r"|(?P<p3>^pi\b|\bpi\b)",
+    re.I,
+)
+
 
 def choose_invoice_attachment(atts: list[dict]) -> tuple[int, dict] | None:
     # Return (1-based index, attachment dict)
-    # Preference order in filename: commercial invoice > invoice > proforma > pi
-    patterns = [
-        re.compile(r"commercial\s*invoice", re.I),
-        re.compile(r"\binvoice\b", re.I),
-        re.compile(r"proforma\s*invoice|\bproforma\b", re.I),
-        re.compile(r"^pi\b|\bpi\b", re.I),
-    ]
-    for pat in patterns:
-        for i, a in enumerate(atts, start=1):
-            fn = a.get("filename") or a.get("title") or ""
-            if pat.search(fn):
-                return (i, a)
+    best_rank = 5
+    best: tuple[int, dict] | None = None
+    for i, a in enumerate(atts, start=1):
+        fn = a.get("filename") or a.get("title") or ""
+        # Best rank across all matches in the name: the leftmost match alone
+        # would let an early "pi" shadow a later "invoice".
+        rank = min(
+            (int(m.lastgroup[1:]) for m in _INVOICE_RE.finditer(fn)),  # "p0".."p3" -> 0..3
+            default=5,
+        )
+        if rank < best_rank:
+            best_rank = rank
+            best = (i, a)
+            if rank == 0:
+                break
+    if best:
+        return best
     if atts:
         return (1, atts[0])
     return None
@@ -34,15 +60,10 @@ def main():
         f"in:inbox newer_than:{days}d has:attachment filename:pdf",
     )
 
-    # Load .env if present
-    try:
-        from dotenv import dotenv_values
-        os.environ.update({k: v for k, v in dotenv_values(".env").items() if v})
-    except Exception:
-        pass
+    # Load .env and put src on sys.path (cached; parses .env at most once)
+    from _bootstrap import load_env
 
-    # Ensure imports from src
-    sys.path.insert(0, str(Path.cwd() / "src"))
+    load_env()
     from agents_demo.main import (
         _gmail_list_attachments_impl,
         _gmail_download_attachment_impl,
@@ -76,18 +97,16 @@ def main():
     )
     print(f"Downloaded: {out_pdf}")
 
-    # Convert to Markdown using markitdown library
+    # Convert to Markdown (text-layer fast path, MarkItDown fallback)
     try:
-        from markitdown import MarkItDown
-    except Exception as e:
+        from agents_demo.main import _convert_pdf_to_md
+        md_text = _convert_pdf_to_md(out_pdf)
+    except ImportError:
         print("markitdown not installed; run: pip install 'markitdown[all]'")
         sys.exit(4)
-
-    md = MarkItDown(enable_plugins=False)
-    result = md.convert(out_pdf)
     converted_dir = Path("data/converted"); converted_dir.mkdir(parents=True, exist_ok=True)
     md_path = converted_dir / "gmail_latest_invoice.md"
-    md_path.write_text(result.text_content, encoding="utf-8")
+    md_path.write_text(md_text, encoding="utf-8")
     print(f"Markdown saved to: {md_path}")
 
     # Extract invoice via an Agent
@@ -104,13 +123,13 @@ def main():
         model=model,
     )
 
-    res = Runner.run_sync(extractor, input=result.text_content)
-    from dataclasses import asdict
-    invoice = asdict(res.final_output)
+    res = Runner.run_sync(extractor, input=md_text)
+    from agents_demo.schemas import invoice_to_dict
+    invoice = invoice_to_dict(res.final_output)
     print("Extracted keys:", list(invoice.keys()))
     # Filter out None values for clarity when posting
     invoice_clean = {k: v for k, v in invoice.items() if v not in (None, "")}
-    invoice_json = json.dumps(invoice_clean)
+    invoice_json = _dumps(invoice_clean)
 
     # Update ClickUp fields
     print(f"Updating ClickUp task: {task_id}")
@@ -127,7 +146,7 @@ def main():
     if invoice_clean.get("line_items"):
         subres = clickup_create_subtasks_from_invoice_line_items_impl(
             task_id=task_id,
-            invoice_json=json.dumps({"line_items": invoice_clean["line_items"]}),
+            invoice_json=_dumps({"line_items": invoice_clean["line_items"]}),
             auto_create_missing=True,
         )
         print("Subtasks:", subres)
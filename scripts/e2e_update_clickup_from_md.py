@@ -1,19 +1,21 @@
 #!/usr/bin/env python3
 """Update ClickUp task from a markdown file."""
-import os
 import sys
-import json
 from pathlib import Path
 
-# Load .env if present
+# orjson is ~3-10x faster on float-heavy payloads like invoice line items
 try:
-    from dotenv import dotenv_values
-    os.environ.update({k: v for k, v in dotenv_values(".env").items() if v})
-except Exception:
-    pass
+    import orjson
+    _dumps = lambda o: orjson.dumps(o).decode()
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _dumps = json.dumps
+    _loads = json.loads
 
-# Ensure imports from src
-sys.path.insert(0, str(Path.cwd() / "src"))
+from _bootstrap import load_env
+
+load_env()
 from agents_demo.main import (
     extract_invoice_from_markdown,
     clickup_update_task_custom_fields_from_invoice_impl,
@@ -46,11 +48,11 @@ def main():
     print("Update result:", upd)
     
     # Create subtasks from line items
-    invoice = json.loads(invoice_json)
+    invoice = _loads(invoice_json)
     if invoice.get("line_items"):
         subres = clickup_create_subtasks_from_invoice_line_items_impl(
             task_id=task_id,
-            invoice_json=json.dumps({"line_items": invoice["line_items"]}),
+            invoice_json=_dumps({"line_items": invoice["line_items"]}),
             auto_create_missing=True,
         )
         print("Subtasks:", subres)
@@ -1,18 +1,10 @@
 #!/usr/bin/env python3
 """Test Gmail to Markdown conversion."""
-import os
 import sys
-from pathlib import Path
 
-# Load .env if present
-try:
-    from dotenv import dotenv_values
-    os.environ.update({k: v for k, v in dotenv_values(".env").items() if v})
-except Exception:
-    pass
+from _bootstrap import load_env
 
-# Ensure imports from src
-sys.path.insert(0, str(Path.cwd() / "src"))
+load_env()
 from agents_demo.main import gmail_query_to_markdown
 
 def main():
@@ -1,4 +1,5 @@
 import asyncio
+import functools
 import os
 import shutil
 import sys
@@ -25,7 +26,7 @@ _repo_root = _PathForSys(__file__).resolve().parents[2]
 _src_path = _repo_root / "src"
 if str(_src_path) not in sys.path:
     sys.path.insert(0, str(_src_path))
-from agents_demo.schemas import Invoice, InvoiceLineItem
+from agents_demo.schemas import Invoice, InvoiceLineItem, invoice_to_dict
 import requests
 from pathlib import Path
 import json
@@ -37,6 +38,747 @@ from typing import List, Optional as TOptional
 load_dotenv()
 
 
+GMAIL_API_BASE = "https://gmail.googleapis.com/gmail/v1/users/me"
+GMAIL_BATCH_URL = "https://gmail.googleapis.com/batch/gmail/v1"
+# Gmail caps a multipart batch at 100 inner requests.
+GMAIL_BATCH_MAX = 100
+DOWNLOADS_DIR = _repo_root / "data" / "downloads"
+
+
+def _gmail_headers(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+@functools.lru_cache(maxsize=4)
+def _session_for(token: str) -> "requests.Session":
+    """Pooled session with the Authorization header baked in, one per token.
+
+    Baking the header into the session defaults skips the per-call header
+    dict build and merge across the hundreds of requests a bulk sync makes.
+    """
+    session = requests.Session()
+    session.headers.update(_gmail_headers(token))
+    session.mount(
+        "https://", requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=8)
+    )
+    return session
+
+
+def _gmail_list_message_ids_impl(token: str, query: str, max_results: int = 25) -> List[str]:
+    """Return Gmail message ids matching a search query (messages.list)."""
+    resp = _session_for(token).get(
+        f"{GMAIL_API_BASE}/messages",
+        params={"q": query, "maxResults": max_results},
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return [m["id"] for m in (resp.json().get("messages") or [])]
+
+
+_BATCH_CONTENT_ID_RE = None  # compiled lazily below
+
+
+def _parse_gmail_batch_response(resp: "requests.Response") -> List[dict]:
+    """Parse a multipart/mixed Gmail batch response into JSON bodies.
+
+    Returns the inner message dicts ordered by their Content-ID index so
+    callers see the same order the ids were submitted in.
+    """
+    global _BATCH_CONTENT_ID_RE
+    if _BATCH_CONTENT_ID_RE is None:
+        import re as _re
+
+        _BATCH_CONTENT_ID_RE = _re.compile(rb"Content-ID:\s*<response-(\d+)>", _re.I)
+
+    ctype = resp.headers.get("Content-Type", "")
+    marker = "boundary="
+    if marker not in ctype:
+        raise RuntimeError(f"Unexpected batch response Content-Type: {ctype}")
+    boundary = ctype.split(marker, 1)[1].split(";")[0].strip('" ')
+
+    indexed: List[tuple] = []
+    for part in resp.content.split(b"--" + boundary.encode("ascii")):
+        start = part.find(b"{")
+        end = part.rfind(b"}")
+        if start == -1 or end == -1:
+            continue
+        m = _BATCH_CONTENT_ID_RE.search(part[:start])
+        idx = int(m.group(1)) if m else len(indexed)
+        indexed.append((idx, json.loads(part[start : end + 1])))
+    return [body for _, body in sorted(indexed, key=lambda t: t[0])]
+
+
+def _gmail_get_messages_batch_impl(token: str, message_ids: List[str]) -> List[dict]:
+    """Fetch many full messages with one batch POST per 100 ids.
+
+    Collapses the N+1 messages.list + per-message messages.get pattern into
+    one round-trip per chunk; for 50 messages that is 2 HTTP calls total
+    instead of 51. Chunks are posted sequentially on purpose: Gmail rejects
+    too many concurrent batches per user, and one in-flight batch already
+    removes the RTT-per-message cost.
+    """
+    import uuid
+
+    out: List[dict] = []
+    for i in range(0, len(message_ids), GMAIL_BATCH_MAX):
+        chunk = message_ids[i : i + GMAIL_BATCH_MAX]
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for j, mid in enumerate(chunk):
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <{j}>\r\n\r\n"
+                f"GET /gmail/v1/users/me/messages/{mid}?format=full HTTP/1.1\r\n\r\n"
+            )
+        body = "".join(parts) + f"--{boundary}--\r\n"
+        resp = _session_for(token).post(
+            GMAIL_BATCH_URL,
+            headers={"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            data=body.encode("utf-8"),
+            timeout=60,
+        )
+        resp.raise_for_status()
+        out.extend(_parse_gmail_batch_response(resp))
+    return out
+
+
+def _header_value(payload: dict, name: str) -> str:
+    for h in payload.get("headers") or []:
+        if str(h.get("name", "")).lower() == name.lower():
+            return str(h.get("value") or "")
+    return ""
+
+
+def _walk_attachment_parts(payload: dict) -> List[dict]:
+    """Collect attachment parts (with attachmentId) from a message payload tree."""
+    out: List[dict] = []
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        body = part.get("body") or {}
+        if part.get("filename") and body.get("attachmentId"):
+            out.append(
+                {
+                    "attachmentId": body["attachmentId"],
+                    "filename": part["filename"],
+                    "mimeType": part.get("mimeType") or "",
+                    "size": int(body.get("size") or 0),
+                }
+            )
+        stack.extend(part.get("parts") or [])
+    return out
+
+
+def _gmail_list_messages_with_attachments_impl(
+    token: str,
+    query: str,
+    max_results: int = 25,
+    mime_types: TOptional[List[str]] = None,
+) -> List[dict]:
+    """List messages (with subject/date) and their attachments for a query.
+
+    Returns a list of dicts: messageId, threadId, subject, from, internalDate,
+    attachments (list of attachmentId/filename/mimeType/size dicts).
+    """
+    ids = _gmail_list_message_ids_impl(token, query, max_results=max_results)
+    out: List[dict] = []
+    for mid, msg in zip(ids, _gmail_get_messages_batch_impl(token, ids)):
+        payload = msg.get("payload") or {}
+        atts = _walk_attachment_parts(payload)
+        if mime_types:
+            wanted = {m.lower() for m in mime_types}
+            atts = [a for a in atts if a["mimeType"].lower() in wanted]
+        if not atts:
+            continue
+        out.append(
+            {
+                "messageId": msg.get("id") or mid,
+                "threadId": msg.get("threadId") or "",
+                "subject": _header_value(payload, "Subject"),
+                "from": _header_value(payload, "From"),
+                "date": _header_value(payload, "Date"),
+                "internalDate": msg.get("internalDate") or "",
+                "attachments": atts,
+            }
+        )
+    return out
+
+
+def _gmail_list_attachments_impl(
+    token: str,
+    query: str,
+    max_results: int = 25,
+    mime_types: TOptional[List[str]] = None,
+) -> List[dict]:
+    """Flat attachment list for a query; one dict per attachment."""
+    out: List[dict] = []
+    for msg in _gmail_list_messages_with_attachments_impl(
+        token, query, max_results=max_results, mime_types=mime_types
+    ):
+        for a in msg["attachments"]:
+            out.append(
+                {
+                    "messageId": msg["messageId"],
+                    "threadId": msg["threadId"],
+                    "subject": msg["subject"],
+                    "internalDate": msg["internalDate"],
+                    **a,
+                }
+            )
+    return out
+
+
+def _gmail_get_attachment_bytes_impl(
+    token: str, message_id: str, attachment_id: str, session=None
+) -> bytes:
+    """Fetch an attachment's raw bytes in memory (attachments.get, no disk I/O).
+
+    Pass a `requests.Session` to reuse pooled connections across many fetches;
+    without one, the per-token cached session is used.
+    """
+    if session is None:
+        resp = _session_for(token).get(
+            f"{GMAIL_API_BASE}/messages/{message_id}/attachments/{attachment_id}",
+            timeout=30,
+        )
+    else:
+        resp = session.get(
+            f"{GMAIL_API_BASE}/messages/{message_id}/attachments/{attachment_id}",
+            headers=_gmail_headers(token),
+            timeout=30,
+        )
+    resp.raise_for_status()
+    return base64.urlsafe_b64decode(resp.json()["data"])
+
+
+def _gmail_download_attachment_impl(
+    token: str, message_id: str, attachment_id: str, filename: TOptional[str] = None
+) -> str:
+    """Download an attachment to data/downloads and return the saved path."""
+    data = _gmail_get_attachment_bytes_impl(token, message_id, attachment_id)
+    DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    name = Path(filename or f"gmail_{attachment_id}").name
+    path = DOWNLOADS_DIR / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def gmail_download_attachment(message_id: str, attachment_id: str, filename: TOptional[str] = None) -> str:
+    """Env-token convenience wrapper around `_gmail_download_attachment_impl`."""
+    token = os.getenv("GMAIL_AUTHORIZATION")
+    if not token:
+        raise RuntimeError("GMAIL_AUTHORIZATION missing in env.")
+    return _gmail_download_attachment_impl(token, message_id, attachment_id, filename=filename)
+
+
+def gmail_download_attachment_bytes(message_id: str, attachment_id: str) -> bytes:
+    """Env-token convenience wrapper around `_gmail_get_attachment_bytes_impl`.
+
+    Use this over `gmail_download_attachment` when no file on disk is needed.
+    """
+    token = os.getenv("GMAIL_AUTHORIZATION")
+    if not token:
+        raise RuntimeError("GMAIL_AUTHORIZATION missing in env.")
+    return _gmail_get_attachment_bytes_impl(token, message_id, attachment_id)
+
+
+CLICKUP_API_BASE = "https://api.clickup.com/api/v2"
+CONVERTED_DIR = _repo_root / "data" / "converted"
+FIELD_MAP_PATH = _repo_root / "config" / "clickup_field_map.json"
+
+_EXTRACTOR_INSTRUCTIONS = (
+    "You extract invoice or quote data from text. "
+    "Identify invoice/quote number, dates, vendor/buyer details, currency, subtotal, tax, total, "
+    "PO number, and line items. For line items, extract product/name/description, quantity, unit, unit_price, amount. "
+    "Return only what is present and reasonable."
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _markitdown():
+    """One shared MarkItDown instance; construction does plugin/backend discovery.
+
+    Safe to reuse because MarkItDown holds no per-conversion state.
+    """
+    from markitdown import MarkItDown
+
+    return MarkItDown(enable_plugins=False)
+
+
+# Digitally-native PDFs embed a text layer dense enough that page-1 extraction
+# yields at least this many chars per byte of file; scans/image PDFs fall well
+# below it and go through the full MarkItDown pipeline instead.
+_PDF_TEXT_RATIO = 0.005
+_PDF_TEXT_MIN_CHARS = 500
+MD_CACHE_DIR = CONVERTED_DIR / ".cache"
+
+
+def _convert_pdf_to_md(path: str) -> str:
+    """Convert a PDF to markdown text, preferring the cheap text-layer path.
+
+    Results are cached on disk under data/converted/.cache keyed by the
+    SHA-256 of the PDF bytes, so retries and duplicate email attachments skip
+    conversion entirely. On a miss, if pypdf extracts a healthy amount of text
+    from page 1, the whole document is read via pypdf (roughly an order of
+    magnitude cheaper than MarkItDown's rich pipeline); otherwise fall back
+    to `_markitdown()`.
+    """
+    import hashlib
+
+    digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    cache_path = MD_CACHE_DIR / f"{digest}.md"
+    try:
+        return cache_path.read_text(encoding="utf-8")
+    except OSError:
+        pass
+
+    text = _convert_pdf_to_md_uncached(path)
+
+    # Atomic write so a crashed conversion never leaves a truncated entry.
+    # The tmp name is per-writer: duplicate attachments hash to the same
+    # digest, and pool workers converting them concurrently must not truncate
+    # each other's in-flight tmp file.
+    try:
+        import tempfile
+
+        MD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=MD_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, cache_path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        pass
+    return text
+
+
+def _convert_pdf_to_md_uncached(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        first = reader.pages[0].extract_text() or ""
+        ratio = len(first) / max(os.path.getsize(path), 1)
+        if ratio > _PDF_TEXT_RATIO:
+            pages = [p.extract_text() or "" for p in reader.pages]
+            if sum(len(p) for p in pages) > _PDF_TEXT_MIN_CHARS:
+                return "\n\n".join(
+                    f"## Page {i}\n\n{text}" for i, text in enumerate(pages, start=1)
+                )
+    except Exception:
+        pass
+    return _markitdown().convert(path).text_content
+
+
+def _invoice_extractor_agent(output_type=Invoice) -> Agent:
+    model = os.getenv("OPENAI_DEFAULT_MODEL", "gpt-5-nano")
+    return Agent(
+        name="Invoice/Quote extractor",
+        instructions=_EXTRACTOR_INSTRUCTIONS,
+        output_type=output_type,
+        model=model,
+    )
+
+
+def _invoice_to_clean_dict(inv: Invoice) -> dict:
+    return {k: v for k, v in invoice_to_dict(inv).items() if v not in (None, "")}
+
+
+# Below this, a "document" is almost certainly a cover letter or
+# signature-only page; not worth an LLM round-trip.
+_TRIVIAL_MD_MIN_CHARS = 200
+
+
+def _is_trivial_md(text: str) -> bool:
+    """True for markdown too small or digit-free to hold invoice data."""
+    return len(text) < _TRIVIAL_MD_MIN_CHARS or not any(c.isdigit() for c in text)
+
+
+def extract_invoice_from_markdown(md_file: str) -> str:
+    """Extract invoice data from a markdown file; returns invoice JSON."""
+    text = Path(md_file).read_text(encoding="utf-8")
+    if _is_trivial_md(text):
+        print(f"skipped (trivial content): {md_file}")
+        return json.dumps({})
+    res = Runner.run_sync(_invoice_extractor_agent(), input=text)
+    return json.dumps(_invoice_to_clean_dict(res.final_output))
+
+
+def extract_invoices_batch(md_texts: List[str]) -> List[Invoice]:
+    """Extract many invoices with a single structured-output Agent run.
+
+    One call with `output_type=list[Invoice]` replaces N separate runs,
+    dropping N-1 LLM round-trips and amortizing the system prompt across the
+    batch. Falls back to one run per document if the batch output cannot be
+    matched back to the inputs.
+    """
+    if not md_texts:
+        return []
+
+    # Pre-filter documents too small or digit-free to hold invoice data, so
+    # cover letters and signature-only pages never reach the model.
+    results: List[TOptional[Invoice]] = [None] * len(md_texts)
+    pending: List[tuple] = []
+    for i, text in enumerate(md_texts):
+        if _is_trivial_md(text):
+            print(f"skipped (trivial content): document {i + 1}")
+            results[i] = Invoice()
+        else:
+            pending.append((i, text))
+    if not pending:
+        return results  # type: ignore[return-value]
+
+    extracted: TOptional[List[Invoice]] = None
+    if len(pending) > 1:
+        numbered = "\n\n".join(
+            f"### Document {n}\n{t}" for n, (_, t) in enumerate(pending, start=1)
+        )
+        prompt = (
+            f"You are given {len(pending)} documents, each under a '### Document i' "
+            "header. Extract one invoice per document and return a JSON array where "
+            "index i-1 corresponds to Document i. Use empty fields for documents "
+            "that contain no invoice data.\n\n" + numbered
+        )
+        try:
+            res = Runner.run_sync(
+                _invoice_extractor_agent(output_type=list[Invoice]), input=prompt
+            )
+            out = list(res.final_output or [])
+            if len(out) == len(pending):
+                extracted = out
+        except Exception:
+            pass
+
+    if extracted is None:
+        # Graceful degradation: one run per document, overlapped. The per-doc
+        # calls are pure I/O wait, so gather them behind a small semaphore
+        # instead of blocking on each in turn.
+        agent = _invoice_extractor_agent()
+
+        async def _run_all() -> List[Invoice]:
+            sem = asyncio.Semaphore(4)
+
+            async def _one(text: str) -> Invoice:
+                async with sem:
+                    return (await Runner.run(agent, input=text)).final_output
+
+            return list(await asyncio.gather(*(_one(t) for _, t in pending)))
+
+        extracted = asyncio.run(_run_all())
+
+    for (i, _), inv in zip(pending, extracted):
+        results[i] = inv
+    return results  # type: ignore[return-value]
+
+
+def _clickup_headers() -> dict:
+    token = os.getenv("CLICKUP_AUTHORIZATION")
+    if not token:
+        raise RuntimeError("CLICKUP_AUTHORIZATION missing in env.")
+    return {"Authorization": token, "Content-Type": "application/json"}
+
+
+def _clickup_get_task_impl(task_id: str) -> dict:
+    resp = requests.get(f"{CLICKUP_API_BASE}/task/{task_id}", headers=_clickup_headers(), timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _clickup_list_fields_impl(list_id: str) -> List[dict]:
+    resp = requests.get(f"{CLICKUP_API_BASE}/list/{list_id}/field", headers=_clickup_headers(), timeout=30)
+    resp.raise_for_status()
+    return resp.json().get("fields") or []
+
+
+def _clickup_create_field_impl(list_id: str, name: str, field_type: str) -> TOptional[str]:
+    """Best-effort creation of a list custom field; returns the field id or None."""
+    try:
+        resp = requests.post(
+            f"{CLICKUP_API_BASE}/list/{list_id}/field",
+            headers=_clickup_headers(),
+            json={"name": name, "type": field_type},
+            timeout=30,
+        )
+        resp.raise_for_status()
+        return str(resp.json().get("id") or "") or None
+    except Exception:
+        return None
+
+
+def _clickup_create_task_impl(
+    list_id: str, name: str, description: str = "", parent: TOptional[str] = None
+) -> dict:
+    payload: dict = {"name": name, "description": description}
+    if parent:
+        payload["parent"] = parent
+    resp = requests.post(
+        f"{CLICKUP_API_BASE}/list/{list_id}/task",
+        headers=_clickup_headers(),
+        json=payload,
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _normalize_field_name(name: str) -> str:
+    return name.strip().lower().replace("_", " ")
+
+
+def _load_field_map(field_map_json: str = "") -> dict:
+    """Explicit map from arg, else config/clickup_field_map.json (non-empty entries)."""
+    if field_map_json:
+        try:
+            return {k: v for k, v in json.loads(field_map_json).items() if v}
+        except Exception:
+            return {}
+    try:
+        return {k: v for k, v in json.loads(FIELD_MAP_PATH.read_text()).items() if v}
+    except Exception:
+        return {}
+
+
+def clickup_update_task_custom_fields_from_invoice_impl(
+    task_id: str,
+    invoice_json: str,
+    field_map_json: str = "",
+    update_description: bool = False,
+    auto_create_missing: bool = False,
+) -> dict:
+    """Set a task's custom fields from extracted invoice JSON.
+
+    Field ids come from `field_map_json` (or config/clickup_field_map.json),
+    falling back to name-matching against the task list's existing fields.
+    Unknown fields are optionally created (short_text or number) when
+    `auto_create_missing` is true.
+    """
+    invoice = json.loads(invoice_json) if invoice_json else {}
+    scalars = {
+        k: v
+        for k, v in invoice.items()
+        if k != "line_items" and v not in (None, "") and not isinstance(v, (list, dict))
+    }
+
+    task = _clickup_get_task_impl(task_id)
+    list_id = str((task.get("list") or {}).get("id") or "")
+    fields = _clickup_list_fields_impl(list_id) if list_id else []
+    by_name = {_normalize_field_name(str(f.get("name") or "")): str(f.get("id")) for f in fields}
+    field_map = _load_field_map(field_map_json)
+
+    updated: List[str] = []
+    created_fields: List[str] = []
+    warnings: List[str] = []
+    for key, value in scalars.items():
+        field_id = field_map.get(key) or by_name.get(_normalize_field_name(key))
+        if not field_id and auto_create_missing and list_id:
+            field_type = "number" if isinstance(value, (int, float)) else "short_text"
+            field_id = _clickup_create_field_impl(list_id, key.replace("_", " ").title(), field_type)
+            if field_id:
+                created_fields.append(key)
+        if not field_id:
+            warnings.append(f"No ClickUp field for '{key}'")
+            continue
+        resp = requests.post(
+            f"{CLICKUP_API_BASE}/task/{task_id}/field/{field_id}",
+            headers=_clickup_headers(),
+            json={"value": value},
+            timeout=30,
+        )
+        if resp.status_code < 200 or resp.status_code >= 300:
+            warnings.append(f"Failed to set '{key}': HTTP {resp.status_code}")
+        else:
+            updated.append(key)
+
+    if update_description:
+        lines = [f"- {k}: {v}" for k, v in scalars.items()]
+        requests.put(
+            f"{CLICKUP_API_BASE}/task/{task_id}",
+            headers=_clickup_headers(),
+            json={"description": "Extracted invoice data:\n" + "\n".join(lines)},
+            timeout=30,
+        )
+
+    return {
+        "task_id": task_id,
+        "updated": updated,
+        "created_fields": created_fields,
+        "warnings": warnings,
+    }
+
+
+def clickup_create_subtasks_from_invoice_line_items_impl(
+    task_id: str, invoice_json: str, auto_create_missing: bool = False
+) -> dict:
+    """Create one subtask per invoice line item under the given task."""
+    invoice = json.loads(invoice_json) if invoice_json else {}
+    items = invoice.get("line_items") or []
+
+    task = _clickup_get_task_impl(task_id)
+    list_id = str((task.get("list") or {}).get("id") or "")
+    if not list_id:
+        raise RuntimeError(f"Could not resolve list id for task {task_id}")
+
+    created: List[str] = []
+    errors: List[str] = []
+    for item in items:
+        name = str(item.get("description") or "Line item")[:255]
+        detail = "\n".join(
+            f"{k}: {item[k]}"
+            for k in ("quantity", "unit", "unit_price", "amount")
+            if item.get(k) is not None
+        )
+        try:
+            sub = _clickup_create_task_impl(list_id, name, description=detail, parent=task_id)
+            created.append(str(sub.get("id") or ""))
+        except Exception as e:
+            errors.append(f"Failed to create subtask '{name}': {e}")
+
+    return {"task_id": task_id, "created_subtask_ids": created, "errors": errors}
+
+
+def gmail_query_to_markdown(query: str, output_filename: str = "gmail_test.md") -> str:
+    """Convert the first PDF attachment matching a Gmail query to Markdown.
+
+    Saves the markdown under data/converted and returns the saved path.
+    """
+    token = os.getenv("GMAIL_AUTHORIZATION")
+    if not token:
+        raise RuntimeError("GMAIL_AUTHORIZATION missing in env.")
+
+    atts = _gmail_list_attachments_impl(token, query, max_results=10, mime_types=["application/pdf"])
+    if not atts:
+        raise RuntimeError(f"No PDF attachments found for query: {query}")
+    att = atts[0]
+    pdf_path = _gmail_download_attachment_impl(
+        token, att["messageId"], att["attachmentId"], filename=att.get("filename")
+    )
+
+    text = _convert_pdf_to_md(pdf_path)
+    CONVERTED_DIR.mkdir(parents=True, exist_ok=True)
+    out_path = CONVERTED_DIR / Path(output_filename).name
+    out_path.write_text(text, encoding="utf-8")
+    return str(out_path)
+
+
+def gmail_ingest_inbox_to_clickup_list_impl(
+    list_id: str,
+    gmail_query: str = "in:inbox newer_than:14d has:attachment",
+    max_messages: int = 10,
+    pdf_only: bool = True,
+    create_item_subtasks: bool = True,
+) -> dict:
+    """Ingest Gmail invoice attachments into a ClickUp list, one task per message.
+
+    Pipeline: list messages -> download attachments concurrently -> convert
+    PDFs to markdown -> extract all invoices in one batched Agent run ->
+    create/update ClickUp tasks.
+    """
+    token = os.getenv("GMAIL_AUTHORIZATION")
+    if not token:
+        raise RuntimeError("GMAIL_AUTHORIZATION missing in env.")
+
+    msgs = _gmail_list_messages_with_attachments_impl(
+        token,
+        gmail_query,
+        max_results=max_messages,
+        mime_types=["application/pdf"] if pdf_only else None,
+    )
+    if not msgs:
+        return {"processed": 0, "created_task_ids": [], "errors": []}
+
+    # One invoice per message: take the first (pdf) attachment of each.
+    refs = [
+        {"message_id": m["messageId"], "attachment_id": m["attachments"][0]["attachmentId"],
+         "filename": m["attachments"][0]["filename"]}
+        for m in msgs
+    ]
+
+    # Imported lazily: gmail_invoices imports this module at its own import time.
+    from gmail_invoices import download_many
+
+    blobs = download_many(refs)
+
+    DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    pdf_paths: List[str] = []
+    for ref, blob in zip(refs, blobs):
+        # Prefix with the message id: attachments from different messages are
+        # routinely all named "invoice.pdf", and every blob must land in its
+        # own file before the batch conversion below runs.
+        name = Path(ref["filename"] or f"gmail_{ref['attachment_id']}.pdf").name
+        pdf_path = DOWNLOADS_DIR / f"{ref['message_id']}_{name}"
+        pdf_path.write_bytes(blob)
+        pdf_paths.append(str(pdf_path))
+
+    # PDF parsing is CPU-bound and GIL-held, so fan batches out across
+    # processes; a single document is not worth the worker spawn cost.
+    if len(pdf_paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(len(pdf_paths), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            md_texts = list(executor.map(_convert_pdf_to_md, pdf_paths))
+    else:
+        md_texts = [_convert_pdf_to_md(p) for p in pdf_paths]
+
+    invoices = extract_invoices_batch(md_texts)
+
+    created_task_ids: List[str] = []
+    errors: List[str] = []
+
+    # The per-message ClickUp calls are independent HTTP round-trips; overlap
+    # them (bounded) rather than paying RTT serially per message. The
+    # requests-based impls run in threads so the pooled sessions still apply.
+    async def _ingest_all() -> None:
+        sem = asyncio.Semaphore(4)
+
+        async def _ingest_one(m: dict, inv: Invoice) -> str:
+            invoice = _invoice_to_clean_dict(inv)
+            name = m["subject"] or invoice.get("invoice_number") or m["attachments"][0]["filename"]
+            async with sem:
+                task = await asyncio.to_thread(_clickup_create_task_impl, list_id, str(name))
+                task_id = str(task.get("id") or "")
+                await asyncio.to_thread(
+                    clickup_update_task_custom_fields_from_invoice_impl,
+                    task_id=task_id,
+                    invoice_json=json.dumps(invoice),
+                    update_description=True,
+                    auto_create_missing=True,
+                )
+                if create_item_subtasks and invoice.get("line_items"):
+                    await asyncio.to_thread(
+                        clickup_create_subtasks_from_invoice_line_items_impl,
+                        task_id=task_id,
+                        invoice_json=json.dumps({"line_items": invoice["line_items"]}),
+                        auto_create_missing=True,
+                    )
+            return task_id
+
+        results = await asyncio.gather(
+            *(_ingest_one(m, inv) for m, inv in zip(msgs, invoices)),
+            return_exceptions=True,
+        )
+        for m, r in zip(msgs, results):
+            if isinstance(r, BaseException):
+                errors.append(f"Failed to ingest message {m['messageId']}: {r}")
+            else:
+                created_task_ids.append(r)
+
+    asyncio.run(_ingest_all())
+
+    return {
+        "processed": len(msgs),
+        "created_task_ids": created_task_ids,
+        "errors": errors,
+    }
+
+
 @function_tool
 def add(a: int, b: int) -> int:
     """Add two integers and return the sum."""
@@ -49,12 +791,16 @@ class Connectors:
     clickup: Optional[HostedMCPTool]
 
 
+@functools.lru_cache(maxsize=1)
 def build_connectors() -> Connectors:
     """Build Hosted MCP tools for Gmail and ClickUp if configured.
 
     connector_id values commonly used (verify in docs):
     - Gmail: "connector_gmail"
     - ClickUp: "connector_clickup"
+
+    Cached: the HostedMCPTool configs only depend on env, which does not
+    change mid-run. Call `build_connectors.cache_clear()` after mutating env.
     """
     # Allow skipping hosted connectors for local testing while keeping env tokens for function tools
     if os.getenv("DISABLE_HOSTED_CONNECTORS", "").lower() in {"1", "true", "yes"}:
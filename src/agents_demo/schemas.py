@@ -1,8 +1,8 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import List, Optional
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class InvoiceLineItem:
     description: str
     quantity: Optional[float] = None
@@ -11,7 +11,7 @@ class InvoiceLineItem:
     amount: Optional[float] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Invoice:
     invoice_number: Optional[str] = None
     invoice_date: Optional[str] = None  # ISO date string if available
@@ -27,3 +27,23 @@ class Invoice:
     po_number: Optional[str] = None
     line_items: List[InvoiceLineItem] = field(default_factory=list)
 
+
+# Field-name tuples computed once; the classes use __slots__ so there is no
+# per-instance __dict__ to copy from.
+_INVOICE_FIELDS = tuple(f.name for f in fields(Invoice))
+_LINE_ITEM_FIELDS = tuple(f.name for f in fields(InvoiceLineItem))
+
+
+def invoice_to_dict(inv: Invoice) -> dict:
+    """Flatten an Invoice to a plain dict.
+
+    The schema is fixed and only one level deep, so building the dict directly
+    skips `dataclasses.asdict`'s recursive walk and deepcopy semantics, which
+    allocate per field and per line item.
+    """
+    out = {name: getattr(inv, name) for name in _INVOICE_FIELDS}
+    out["line_items"] = [
+        {name: getattr(li, name) for name in _LINE_ITEM_FIELDS} for li in inv.line_items
+    ]
+    return out
+
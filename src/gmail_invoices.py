@@ -10,6 +10,7 @@ Developer notes:
 Public API:
 - list_invoice_attachments(query: str, lookback_days: int) -> list[AttachmentRef]
 - download_attachment(ref: AttachmentRef) -> bytes
+- download_many(refs: list[AttachmentRef], max_workers: int | None = None) -> list[bytes]
 - upload_pdf_to_planner(pdf_bytes: bytes, *, source_message_id: str | None = None) -> InsertReport
 
 Data contracts (dict-like):
@@ -35,48 +36,194 @@ Data contracts (dict-like):
 from __future__ import annotations
 
 import base64
+import functools
+import io
 import os
-from datetime import datetime, timezone
-from typing import Any, Dict, List
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, TypedDict
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Optional: streams the multipart body instead of materializing a second
+# full copy of the PDF in memory. Falls back to requests' files= encoding.
+try:
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
+# Optional: decodes large planner responses faster than stdlib json, and
+# reading resp.content skips requests' encoding-detect + str decode on the way.
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
 
 # Reuse existing Gmail helpers only; do not call Gmail API directly here.
 from agents_demo.main import (
+    _gmail_get_attachment_bytes_impl,  # token-based helper; returns bytes in memory
     _gmail_list_messages_with_attachments_impl,  # token-based helper
-    gmail_download_attachment,  # env-token helper; saves to disk and returns path
 )
 
 
-AttachmentRef = Dict[str, Any]
+class AttachmentRef(TypedDict):
+    """Attachment metadata as returned by `list_invoice_attachments`.
+
+    Still a plain dict at runtime (the public contract), but the field set
+    and types are pinned here so type checkers catch drift.
+    """
+
+    message_id: str
+    attachment_id: str
+    filename: str
+    mime_type: str
+    size_bytes: int
+    thread_id: str
+    subject: str
+    from_address: str
+    received_at: str
+
+
 InsertReport = Dict[str, Any]
 
 
+def _make_session() -> requests.Session:
+    """Pooled session shared across calls: keeps TCP/TLS connections alive and
+    retries transient upstream failures with backoff."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=8,
+        # GET only: the planner upload POSTs a single-use streaming body, and
+        # a urllib3 status-retry would re-send the request with the original
+        # Content-Length but an already-exhausted stream. Uploads do their own
+        # status/timeout retries in `upload_pdf_to_planner`, rebuilding the
+        # body each attempt.
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+        ),
+    )
+    # PLANNER_API_BASE may be plain http (e.g. an internal host), so mount
+    # the pooled adapter on both schemes.
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = _make_session()
+
+
+class _TokenBucket:
+    """Thread-safe token bucket; `acquire` blocks until a token is available."""
+
+    def __init__(self, rate: float):
+        self._rate = float(rate)
+        self._tokens = self._rate
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._rate, self._tokens + (now - self._last) * self._rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self._rate
+            time.sleep(wait)
+
+
+# Keep concurrent downloads comfortably under Gmail's 250 req/user/sec quota;
+# at the default worker counts this never blocks, it only guards bursts.
+_GMAIL_RATE_LIMIT = _TokenBucket(rate=float(os.getenv("GMAIL_RATE_LIMIT_PER_SEC", "200")))
+
+@functools.lru_cache(maxsize=1)
+def _planner_cfg() -> tuple:
+    """Planner upload URL and base headers, resolved once per process.
+
+    Avoids re-reading env and re-building the Authorization header on every
+    upload. Tests that mutate os.environ should call `_planner_cfg.cache_clear()`.
+    """
+    base = _require_env("PLANNER_API_BASE").rstrip("/")
+    api_key = os.getenv("PLANNER_API_KEY") or ""
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    return f"{base}/orders/pending/upload-pdf", headers
+
+
+_UPLOAD_CHUNK_BYTES = 1 << 20
+
+# Extra upload attempts after a timeout or retryable status. The session's
+# urllib3 Retry must not re-send these POSTs (the streaming body is single-use),
+# so both cases are handled in the upload loop, which rebuilds the body.
+_UPLOAD_RETRIES = 2
+
+_RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Multipart boundary for the hand-built fallback body. Random once per process
+# is enough -- it only needs to not collide with the PDF payload -- and
+# computing it at import keeps it off the per-upload path.
+_BOUNDARY = "----planner" + secrets.token_hex(16)
+
+
+def _multipart_chunks(pdf_bytes: bytes, boundary: str):
+    """Yield a multipart/form-data body lazily: preamble, 1 MiB slices, close.
+
+    Handing requests an iterator switches it to chunked transfer encoding, so
+    the full multipart body is never materialized next to the original bytes.
+    """
+    yield (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="invoice.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode("ascii")
+    mv = memoryview(pdf_bytes)
+    for i in range(0, len(mv), _UPLOAD_CHUNK_BYTES):
+        yield mv[i : i + _UPLOAD_CHUNK_BYTES]
+    yield f"\r\n--{boundary}--\r\n".encode("ascii")
+
+
+@functools.lru_cache(maxsize=None)
 def _require_env(name: str) -> str:
+    # Cached: the environment is effectively read-only during a run, and this
+    # is hit once per message in bulk syncs. Tests that mutate os.environ
+    # should call `_require_env.cache_clear()`.
     val = os.getenv(name)
     if not val:
         raise RuntimeError(f"Missing required environment variable: {name}")
     return val
 
 
+@functools.lru_cache(maxsize=128)
 def _append_lookback_to_query(query: str, lookback_days: int) -> str:
+    # Pure function of its arguments; polling-style callers pass the same
+    # (query, days) pair every cycle, so the cache hit rate approaches 100%.
     q = (query or "").strip()
-    tokens = q.lower().split()
-    has_attachment = any(t.startswith("has:attachment") for t in tokens)
-    has_newer_than = any(t.startswith("newer_than:") for t in tokens)
-    if not has_attachment:
+    # Substring checks suffice for the intended grammar; these tokens don't
+    # occur inside other Gmail operators, and this skips the split() list.
+    ql = q.lower()
+    if "has:attachment" not in ql:
         q = f"{q} has:attachment".strip()
-    if lookback_days and lookback_days > 0 and not has_newer_than:
+    if lookback_days and lookback_days > 0 and "newer_than:" not in ql:
         q = f"{q} newer_than:{int(lookback_days)}d".strip()
     return q
 
 
 def _ms_to_iso8601(ms: Any) -> str:
     try:
-        # Gmail internalDate is epoch ms as string
-        ms_int = int(ms)
-        dt = datetime.fromtimestamp(ms_int / 1000.0, tz=timezone.utc)
-        return dt.isoformat().replace("+00:00", "Z")
+        # Gmail internalDate is epoch ms as string. strftime on gmtime skips
+        # the datetime object, its tz-aware isoformat branch, and the
+        # "+00:00" -> "Z" replace; this runs once per attachment in bulk syncs.
+        s, millis = divmod(int(ms), 1000)
+        return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(s)) + f".{millis:03d}Z"
     except Exception:
         # Fallback to empty string if not parseable
         return ""
@@ -97,8 +244,8 @@ def list_invoice_attachments(query: str, lookback_days: int) -> List[AttachmentR
 
     Notes:
         - Prefers PDFs for upload later, but returns any attachment types provided by the helper.
-        - Some metadata (e.g., from_address, thread_id) may be unavailable from the
-          helper; in such cases, fields are present but may be empty strings.
+        - Metadata fields are always present but may be empty strings if the
+          helper could not supply them.
 
     Raises:
         RuntimeError: If Gmail authorization is not configured.
@@ -116,9 +263,8 @@ def list_invoice_attachments(query: str, lookback_days: int) -> List[AttachmentR
         mid = str(m.get("messageId") or "")
         subject = str(m.get("subject") or "")
         received_at = _ms_to_iso8601(m.get("internalDate"))
-        # thread_id and from_address are not exposed by the helper; leave empty.
-        thread_id = ""
-        from_address = ""
+        thread_id = str(m.get("threadId") or "")
+        from_address = str(m.get("from") or "")
         for a in (m.get("attachments") or []):
             out.append(
                 {
@@ -136,22 +282,23 @@ def list_invoice_attachments(query: str, lookback_days: int) -> List[AttachmentR
     return out
 
 
-def download_attachment(ref: AttachmentRef) -> bytes:
+def download_attachment(ref: AttachmentRef, session=None) -> bytes:
     """Download a specific Gmail attachment's raw bytes.
 
     Args:
         ref: AttachmentRef dict as returned by `list_invoice_attachments`.
+        session: Optional `requests.Session` for connection reuse across calls.
 
     Returns:
         The raw attachment bytes.
 
     Behavior:
-        - Reuses the repo's Gmail download helper (which saves to disk) and reads the bytes.
-        - This function itself does not persist data; the helper may write a temp file.
+        - Fetches and base64-decodes the attachment entirely in memory; nothing
+          touches the filesystem.
 
     Raises:
         ValueError: If required identifiers are missing from `ref`.
-        RuntimeError: If download fails or file cannot be read.
+        RuntimeError: If Gmail authorization is not configured or the fetch fails.
     """
     if not isinstance(ref, dict):
         raise ValueError("ref must be a dict AttachmentRef")
@@ -160,26 +307,65 @@ def download_attachment(ref: AttachmentRef) -> bytes:
     if not message_id or not attachment_id:
         raise ValueError("AttachmentRef must include 'message_id' and 'attachment_id'")
 
-    # Delegate to existing helper that returns a saved path; read and cleanup.
-    # Use a short, stable filename hint when possible.
-    preferred_name = ref.get("filename") or f"gmail_{attachment_id}"
-    path = gmail_download_attachment(str(message_id), str(attachment_id), filename=preferred_name)
-
+    token = _require_env("GMAIL_AUTHORIZATION")
+    _GMAIL_RATE_LIMIT.acquire()
     try:
-        with open(path, "rb") as f:
-            data = f.read()
+        return _gmail_get_attachment_bytes_impl(
+            token, str(message_id), str(attachment_id), session=session or _SESSION
+        )
     except Exception as e:
-        raise RuntimeError(f"Failed to read downloaded attachment from {path}: {e}") from e
+        raise RuntimeError(f"Failed to download attachment {attachment_id}: {e}") from e
+
+
+def download_many(refs: List[AttachmentRef], max_workers: int | None = None) -> List[bytes]:
+    """Download many attachments concurrently; results match input order.
+
+    Attachment fetches are network-bound, so overlapping them behind a small
+    thread pool cuts wall time from N*RTT to roughly ceil(N/P)*RTT. A single
+    pooled `requests.Session` keeps TCP/TLS connections alive across workers.
+
+    Args:
+        refs: AttachmentRef dicts as returned by `list_invoice_attachments`.
+        max_workers: Concurrency cap; defaults to env GMAIL_DOWNLOAD_CONCURRENCY
+            (4 if unset). Keep this small to stay well inside Gmail quotas.
+
+    Returns:
+        A list of bytes in the same order as `refs`.
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv("GMAIL_DOWNLOAD_CONCURRENCY", "4"))
+    if not refs:
+        return []
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers
+    )
+    session.mount("https://", adapter)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(download_attachment, ref, session=session): i
+                for i, ref in enumerate(refs)
+            }
+            results: List[bytes] = [b""] * len(refs)
+            for fut in as_completed(futures):
+                results[futures[fut]] = fut.result()
+        return results
     finally:
-        try:
-            # Best-effort cleanup; ignore errors.
-            import os as _os
+        session.close()
 
-            _os.remove(path)
-        except Exception:
-            pass
 
-    return data
+def _upload_retry_delay(resp, attempt: int) -> float:
+    """Seconds to wait before re-trying an upload, honoring Retry-After."""
+    retry_after = getattr(resp, "headers", {}).get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), 30.0)
+        except ValueError:
+            pass
+    return 0.5 * (attempt + 1)
 
 
 def upload_pdf_to_planner(
@@ -202,29 +388,39 @@ def upload_pdf_to_planner(
     if not isinstance(pdf_bytes, (bytes, bytearray)) or len(pdf_bytes) == 0:
         raise ValueError("pdf_bytes must be non-empty bytes")
 
-    # Light PDF sanity check: starts with %PDF
-    try:
-        if not bytes(pdf_bytes[:4]).startswith(b"%PDF"):
-            raise ValueError("Only application/pdf content can be uploaded")
-    except Exception:
-        # If slicing/bytes() fails oddly, still enforce non-empty
-        pass
-
-    base = _require_env("PLANNER_API_BASE").rstrip("/")
-    api_key = os.getenv("PLANNER_API_KEY") or ""
-    url = f"{base}/orders/pending/upload-pdf"
-    headers = {}
-    if api_key:
-        headers["Authorization"] = f"Bearer {api_key}"
+    # Light PDF sanity check: starts with %PDF (zero-copy via memoryview)
+    if memoryview(pdf_bytes)[:4] != b"%PDF":
+        raise ValueError("Only application/pdf content can be uploaded")
 
-    files = {"file": ("invoice.pdf", pdf_bytes, "application/pdf")}
+    url, base_headers = _planner_cfg()
+    headers = dict(base_headers)  # copied; Content-Type is set per request
 
-    try:
-        resp = requests.post(url, headers=headers, files=files, timeout=30)
-    except requests.Timeout as e:
-        raise TimeoutError("Upload to planning app timed out after 30s") from e
-    except Exception as e:
-        raise RuntimeError(f"Failed to upload PDF to planner: {e}") from e
+    # The body is rebuilt per attempt: both the encoder and the chunk
+    # generator are single-use streams.
+    for attempt in range(_UPLOAD_RETRIES + 1):
+        try:
+            if MultipartEncoder is not None:
+                body = MultipartEncoder(
+                    fields={"file": ("invoice.pdf", io.BytesIO(pdf_bytes), "application/pdf")}
+                )
+                headers["Content-Type"] = body.content_type
+            else:
+                # No toolbelt: stream a hand-built multipart body instead of
+                # letting requests buffer a second full copy via files=.
+                headers["Content-Type"] = f"multipart/form-data; boundary={_BOUNDARY}"
+                body = _multipart_chunks(pdf_bytes, _BOUNDARY)
+            resp = _SESSION.post(url, headers=headers, data=body, timeout=30)
+        except requests.Timeout as e:
+            if attempt == _UPLOAD_RETRIES:
+                raise TimeoutError("Upload to planning app timed out after 30s") from e
+            time.sleep(0.5 * (attempt + 1))
+            continue
+        except Exception as e:
+            raise RuntimeError(f"Failed to upload PDF to planner: {e}") from e
+        if resp.status_code in _RETRYABLE_STATUSES and attempt < _UPLOAD_RETRIES:
+            time.sleep(_upload_retry_delay(resp, attempt))
+            continue
+        break
 
     if resp.status_code < 200 or resp.status_code >= 300:
         # Friendly error with short body excerpt (avoid logging secrets)
@@ -232,7 +428,11 @@ def upload_pdf_to_planner(
         raise RuntimeError(f"Planner upload failed: HTTP {resp.status_code}: {text}")
 
     try:
-        data = resp.json() if hasattr(resp, "json") else {}
+        raw = getattr(resp, "content", None)
+        if raw:
+            data = _json_loads(raw)
+        else:
+            data = resp.json() if hasattr(resp, "json") else {}
     except Exception:
         data = {}
 
@@ -265,5 +465,6 @@ def upload_pdf_to_planner(
 __all__ = [
     "list_invoice_attachments",
     "download_attachment",
+    "download_many",
     "upload_pdf_to_planner",
 ]
\ No newline at end of file
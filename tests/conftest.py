@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+
+# Ensure 'src' is importable when running tests from the repo root. Done here
+# so every test module gets it without repeating the boilerplate.
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+
+@pytest.fixture(autouse=True)
+def clear_env_caches():
+    """Reset env-derived lru_caches so per-test os.environ mutations apply."""
+    import gmail_invoices
+
+    gmail_invoices._require_env.cache_clear()
+    gmail_invoices._planner_cfg.cache_clear()
+    yield
+
+
+@pytest.fixture
+def gmail_env(monkeypatch):
+    """Set the Gmail token env var, undone automatically after the test."""
+    monkeypatch.setenv("GMAIL_AUTHORIZATION", "test-token")
+
+
+@pytest.fixture
+def planner_env(monkeypatch):
+    """Set the planner endpoint env vars, undone automatically after the test."""
+    monkeypatch.setenv("PLANNER_API_BASE", "http://planner.local")
+    monkeypatch.setenv("PLANNER_API_KEY", "testkey")
@@ -1,20 +1,19 @@
-import os
-import sys
 from typing import Any
 
 import pytest
 
+# Imported once at module scope; tests patch attributes on the module object
+# instead of re-resolving dotted paths per test.
+import gmail_invoices
+from gmail_invoices import (
+    download_attachment,
+    download_many,
+    list_invoice_attachments,
+    upload_pdf_to_planner,
+)
 
-# Ensure 'src' is importable when running tests from repo root
-ROOT = os.path.dirname(os.path.dirname(__file__))
-SRC = os.path.join(ROOT, "src")
-if SRC not in sys.path:
-    sys.path.insert(0, SRC)
-
-
-def test_list_invoice_attachments_basic(monkeypatch):
-    os.environ["GMAIL_AUTHORIZATION"] = "test-token"
 
+def test_list_invoice_attachments_basic(monkeypatch, gmail_env):
     # Fake Gmail helper output: one message with two attachments (pdf + non-pdf)
     sample = [
         {
@@ -45,55 +44,50 @@ def test_list_invoice_attachments_basic(monkeypatch):
         return sample
 
     monkeypatch.setattr(
-        "agents_demo.main._gmail_list_messages_with_attachments_impl", fake_list_impl
+        gmail_invoices, "_gmail_list_messages_with_attachments_impl", fake_list_impl
     )
 
-    from gmail_invoices import list_invoice_attachments
-
     out = list_invoice_attachments("in:inbox", 14)
-    assert isinstance(out, list)
-    assert len(out) == 2
-    for item in out:
-        # Required keys
-        for key in [
-            "message_id",
-            "attachment_id",
-            "filename",
-            "mime_type",
-            "size_bytes",
-            "thread_id",
-            "subject",
-            "from_address",
-            "received_at",
-        ]:
-            assert key in item
-        # Types
-        assert isinstance(item["message_id"], str)
-        assert isinstance(item["attachment_id"], str)
-        assert isinstance(item["filename"], str)
-        assert isinstance(item["mime_type"], str)
-        assert isinstance(item["size_bytes"], int)
-        assert isinstance(item["thread_id"], str)
-        assert isinstance(item["subject"], str)
-        assert isinstance(item["from_address"], str)
-        assert isinstance(item["received_at"], str)
-
-
-def test_download_attachment_reads_bytes(monkeypatch, tmp_path):
-    from gmail_invoices import download_attachment
-
-    # Create a fake downloaded file
-    p = tmp_path / "test.pdf"
+    # One comparison covers keys, types, and values for the whole contract.
+    assert out == [
+        {
+            "message_id": "m1",
+            "attachment_id": "a1",
+            "filename": "inv.pdf",
+            "mime_type": "application/pdf",
+            "size_bytes": 1234,
+            "thread_id": "",
+            "subject": "Invoice ABC",
+            "from_address": "",
+            "received_at": "2024-09-04T19:31:34.000Z",
+        },
+        {
+            "message_id": "m1",
+            "attachment_id": "a2",
+            "filename": "image.png",
+            "mime_type": "image/png",
+            "size_bytes": 999,
+            "thread_id": "",
+            "subject": "Invoice ABC",
+            "from_address": "",
+            "received_at": "2024-09-04T19:31:34.000Z",
+        },
+    ]
+
+
+def test_download_attachment_reads_bytes(monkeypatch, gmail_env):
     content = b"%PDF-1.7\n...bytes..."
-    p.write_bytes(content)
 
-    # Mock the helper to return the path
-    def fake_download(message_id: str, attachment_id: str, filename: str | None = None) -> str:
+    # Mock the in-memory helper to return the bytes directly
+    def fake_get_bytes(token: str, message_id: str, attachment_id: str, session=None) -> bytes:
+        assert token == "test-token"
         assert message_id == "m1"
         assert attachment_id == "a1"
-        return str(p)
+        return content
 
-    monkeypatch.setattr("agents_demo.main.gmail_download_attachment", fake_download)
+    monkeypatch.setattr(
+        gmail_invoices, "_gmail_get_attachment_bytes_impl", fake_get_bytes
+    )
 
     ref = {
         "message_id": "m1",
@@ -110,12 +104,51 @@ def test_download_attachment_reads_bytes(monkeypatch, tmp_path):
     assert data == content
 
 
-def test_upload_pdf_to_planner_success(monkeypatch):
-    os.environ["PLANNER_API_BASE"] = "http://planner.local"
-    os.environ["PLANNER_API_KEY"] = "testkey"
+def test_download_many_preserves_input_order(monkeypatch, gmail_env):
+    import time
+
+    refs = [{"message_id": f"m{i}", "attachment_id": f"a{i}"} for i in range(5)]
+
+    def fake_get_bytes(token, message_id, attachment_id, session=None):
+        # Later submissions finish first; results must still match input order.
+        time.sleep(0.01 * (5 - int(attachment_id[1:])))
+        return attachment_id.encode()
+
+    monkeypatch.setattr(
+        gmail_invoices, "_gmail_get_attachment_bytes_impl", fake_get_bytes
+    )
+
+    out = download_many(refs, max_workers=5)
+    assert out == [b"a0", b"a1", b"a2", b"a3", b"a4"]
+
+
+def test_download_many_propagates_worker_error(monkeypatch, gmail_env):
+    refs = [
+        {"message_id": "m0", "attachment_id": "a0"},
+        {"message_id": "m1", "attachment_id": "a1"},
+    ]
+
+    def fake_get_bytes(token, message_id, attachment_id, session=None):
+        if attachment_id == "a1":
+            raise ValueError("boom")
+        return b"ok"
 
+    monkeypatch.setattr(
+        gmail_invoices, "_gmail_get_attachment_bytes_impl", fake_get_bytes
+    )
+
+    with pytest.raises(RuntimeError) as ei:
+        download_many(refs, max_workers=2)
+    assert "a1" in str(ei.value)
+
+
+def test_upload_pdf_to_planner_success(monkeypatch, planner_env):
     class DummyResp:
         status_code = 200
+        content = (
+            b'{"created_order_ids": ["123"], "warnings": ["minor"],'
+            b' "errors": [], "notes": "ok"}'
+        )
 
         def json(self) -> Any:
             return {
@@ -129,20 +162,22 @@ def test_upload_pdf_to_planner_success(monkeypatch):
         def text(self) -> str:
             return "{\"notes\":\"ok\"}"
 
-    def fake_post(url, headers=None, files=None, timeout=None):
+    def fake_post(url, headers=None, files=None, data=None, timeout=None):
         assert url.endswith("/orders/pending/upload-pdf")
         assert headers.get("Authorization") == "Bearer testkey"
-        assert files and "file" in files
-        filename, body, mime = files["file"]
-        assert filename == "invoice.pdf"
-        assert isinstance(body, (bytes, bytearray))
-        assert mime == "application/pdf"
         assert timeout == 30
+        # Streaming path: multipart encoder or a lazy chunk generator
+        assert files is None and data is not None
+        assert headers.get("Content-Type", "").startswith("multipart/form-data")
+        if hasattr(data, "to_string"):
+            payload = data.to_string()
+        else:
+            payload = b"".join(bytes(c) for c in data)
+        assert b"%PDF" in payload
+        assert b'name="file"' in payload
         return DummyResp()
 
-    monkeypatch.setattr("requests.post", fake_post)
-
-    from gmail_invoices import upload_pdf_to_planner
+    monkeypatch.setattr(gmail_invoices._SESSION, "post", fake_post)
 
     res = upload_pdf_to_planner(b"%PDF-1.4\n...", source_message_id="m1")
     assert res["created_order_ids"] == ["123"]
@@ -152,27 +187,49 @@ def test_upload_pdf_to_planner_success(monkeypatch):
     assert res["notes"] == "ok"
 
 
-def test_upload_pdf_to_planner_timeout(monkeypatch):
+def test_upload_pdf_to_planner_timeout(monkeypatch, planner_env):
     import requests as _req
 
-    os.environ["PLANNER_API_BASE"] = "http://planner.local"
-    os.environ["PLANNER_API_KEY"] = "testkey"
-
-    def fake_post(url, headers=None, files=None, timeout=None):
+    def fake_post(url, headers=None, files=None, data=None, timeout=None):
         raise _req.Timeout("timeout")
 
-    monkeypatch.setattr("requests.post", fake_post)
-
-    from gmail_invoices import upload_pdf_to_planner
+    monkeypatch.setattr(gmail_invoices._SESSION, "post", fake_post)
 
     with pytest.raises(TimeoutError):
         upload_pdf_to_planner(b"%PDF-1.4\n...", source_message_id="m1")
 
 
-def test_upload_pdf_to_planner_error_status(monkeypatch):
-    os.environ["PLANNER_API_BASE"] = "http://planner.local"
-    os.environ["PLANNER_API_KEY"] = "testkey"
+def test_upload_pdf_to_planner_retries_retryable_status(monkeypatch, planner_env):
+    class RetryResp:
+        status_code = 503
+        headers = {"Retry-After": "0"}
+        content = b""
+        text = "unavailable"
+
+        def json(self):
+            return {}
+
+    class OkResp:
+        status_code = 200
+        content = b'{"created_order_ids": ["123"]}'
+
+        def json(self):
+            return {"created_order_ids": ["123"]}
+
+    calls = []
+
+    def fake_post(url, headers=None, files=None, data=None, timeout=None):
+        calls.append(url)
+        return RetryResp() if len(calls) == 1 else OkResp()
 
+    monkeypatch.setattr(gmail_invoices._SESSION, "post", fake_post)
+
+    res = upload_pdf_to_planner(b"%PDF-1.4\n...")
+    assert len(calls) == 2
+    assert res["created_order_ids"] == ["123"]
+
+
+def test_upload_pdf_to_planner_error_status(monkeypatch, planner_env):
     class DummyResp:
         status_code = 400
 
@@ -183,12 +240,10 @@ def test_upload_pdf_to_planner_error_status(monkeypatch):
         def text(self) -> str:
             return "Bad request: invalid PDF"
 
-    def fake_post(url, headers=None, files=None, timeout=None):
+    def fake_post(url, headers=None, files=None, data=None, timeout=None):
         return DummyResp()
 
-    monkeypatch.setattr("requests.post", fake_post)
-
-    from gmail_invoices import upload_pdf_to_planner
+    monkeypatch.setattr(gmail_invoices._SESSION, "post", fake_post)
 
     with pytest.raises(RuntimeError) as ei:
         upload_pdf_to_planner(b"%PDF-1.4\n...")